@@ -2,38 +2,92 @@
 """Fetch PoE2 trade history + current listings, generate dashboard data."""
 
 import argparse
-import csv
 import hashlib
 import json
 import secrets
-import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from operator import itemgetter
 from pathlib import Path
 from urllib.parse import quote
 
-import requests
-from dotenv import load_dotenv
 import os
 
-load_dotenv()
+try:
+    import orjson
+except ImportError:  # stdlib fallback, same on-disk format
+    orjson = None
+
+try:
+    from cryptography.hazmat.primitives import hashes, padding
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:  # fall back to the openssl CLI
+    Cipher = None
 
 DATA_DIR = Path(__file__).parent / "data"
-TRADES_FILE = DATA_DIR / "trades.json"
+TRADES_FILE = DATA_DIR / "trades.jsonl"
+LEGACY_TRADES_FILE = DATA_DIR / "trades.json"
+SEEN_IDS_FILE = DATA_DIR / "seen_ids.txt"
 DASHBOARD_FILE = DATA_DIR / "dashboard.json"
 INVESTORS_FILE = DATA_DIR / "investors.json"
+CACHE_DIR = DATA_DIR / ".cache"
+
+OPENSSL_MAGIC = b"Salted__"
+OPENSSL_PBKDF2_ITERATIONS = 10000  # `openssl enc -pbkdf2` default
 
 HAIRCUT = 0.85
 PERF_FEE_PCT = 0.25
+RECENT_SALES_LIMIT = 50
 
 HISTORY_URL = "https://www.pathofexile.com/api/trade2/history/{league}"
 SEARCH_URL = "https://www.pathofexile.com/api/trade2/search/poe2/{league}"
 FETCH_URL = "https://www.pathofexile.com/api/trade2/fetch/{ids}?query={query_id}&realm=poe2"
 RATES_URL = "https://poe2scout.com/api/currencyExchange/SnapshotPairs?league={league}"
 
+# Columns for CSV export and Google Sheets
+SALE_FIELDS = ("timestamp", "item_name", "base_type", "rarity", "sale_price", "currency", "div_equivalent")
+sale_row = itemgetter(*SALE_FIELDS)
+
+RATES_CACHE_TTL = 300  # seconds
+TRADES_CACHE_TTL = 60  # seconds
+
+FETCH_BATCH_SIZE = 10  # fetch endpoint accepts max 10 IDs at a time
+FETCH_INTERVAL = 2  # seconds between starting fetch batches
+FETCH_WORKERS = 2  # fetch batches allowed in flight at once
+REQUEST_TIMEOUT = 30  # seconds before a PoE API request is abandoned
+
+
+def _loads(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _dumps(obj, indent=True):
+    """Serialize to UTF-8 JSON bytes, 2-space indented or compact."""
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    if indent:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _write_atomic(path, data):
+    """Write bytes via a temp file + os.replace so readers never see a partial file."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
 
 def get_config():
+    from dotenv import load_dotenv
+
+    load_dotenv()
     return {
         "poesessid": os.getenv("POESESSID", ""),
         "league": os.getenv("LEAGUE", "Fate of the Vaal"),
@@ -48,7 +102,11 @@ def make_session(poesessid):
     if not poesessid:
         print("Error: POESESSID not set in .env file")
         sys.exit(1)
+    import requests
+
     s = requests.Session()
+    # One host; keep a connection alive per listing worker plus the trade history fetch
+    s.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_WORKERS + 1))
     s.cookies.set("POESESSID", poesessid)
     s.headers.update({
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
@@ -57,17 +115,47 @@ def make_session(poesessid):
     return s
 
 
-def api_request(session, method, url, max_retries=3, **kwargs):
-    """Make an API request with rate-limit retry and backoff."""
+# Shared pacing for paced api_request calls across worker threads
+_pace_lock = threading.Lock()
+_next_request_at = 0.0
+
+
+def _wait_for_slot(interval):
+    """Block until this thread may start a request, reserving the next slot."""
+    global _next_request_at
+    with _pace_lock:
+        now = time.monotonic()
+        start = max(now, _next_request_at)
+        _next_request_at = start + interval
+    if start > now:
+        time.sleep(start - now)
+
+
+def _defer_slots(seconds):
+    """Push every pending paced request back by a server-requested delay."""
+    global _next_request_at
+    with _pace_lock:
+        _next_request_at = max(_next_request_at, time.monotonic() + seconds)
+
+
+def api_request(session, method, url, max_retries=3, interval=0, **kwargs):
+    """Make an API request with rate-limit retry and backoff (paced across threads if interval set)."""
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
     for attempt in range(max_retries):
+        if interval:
+            _wait_for_slot(interval)
         resp = session.request(method, url, **kwargs)
         if resp.status_code == 429:
-            retry_after = int(resp.headers.get("Retry-After", 60))
+            # Honour Retry-After; fall back to exponential backoff without it
+            retry_after = int(resp.headers.get("Retry-After", 0)) or FETCH_INTERVAL * 2 ** attempt
             if retry_after > 30:
                 print(f"  Rate limited for {retry_after}s — too long, skipping")
                 resp.raise_for_status()
             print(f"  Rate limited — waiting {retry_after}s (attempt {attempt + 1}/{max_retries})")
-            time.sleep(retry_after)
+            if interval:
+                _defer_slots(retry_after)
+            else:
+                time.sleep(retry_after)
             continue
         resp.raise_for_status()
         return resp
@@ -75,16 +163,68 @@ def api_request(session, method, url, max_retries=3, **kwargs):
     return resp
 
 
+def api_json(session, method, url, **kwargs):
+    """api_request, decoding the JSON body straight from bytes."""
+    return _loads(api_request(session, method, url, **kwargs).content)
+
+
+# --- Response Cache ---
+
+def _cache_path(key):
+    return CACHE_DIR / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+
+def _cache_get(key, ttl):
+    """Return cached data for key if it is younger than ttl seconds (any age if None), else None."""
+    if os.getenv("CACHE_DISABLED") == "1":
+        return None
+    path = _cache_path(key)
+    try:
+        if ttl is None or time.time() - path.stat().st_mtime < ttl:
+            with open(path, "rb") as f:
+                return _loads(f.read())
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _cache_put(key, data):
+    if os.getenv("CACHE_DISABLED") == "1":
+        return
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _write_atomic(_cache_path(key), _dumps(data, indent=False))
+
+
 # --- Exchange Rates ---
 
-def fetch_exchange_rates(league):
+_scout_session = None
+
+
+def scout_session():
+    """Keep-alive session for poe2scout, separate so the POESESSID cookie never leaves PoE."""
+    global _scout_session
+    if _scout_session is None:
+        import requests
+
+        _scout_session = requests.Session()
+        _scout_session.headers["User-Agent"] = "poe2-investments (local fund tracker)"
+        retry = requests.adapters.Retry(total=2, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
+        _scout_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, max_retries=retry))
+    return _scout_session
+
+
+def fetch_exchange_rates(league, use_cache=True):
     """Fetch currency exchange rates from poe2scout, returns rates relative to divine."""
+    cache_key = f"rates:{league}"
+    cached = _cache_get(cache_key, RATES_CACHE_TTL) if use_cache else None
+    if cached is not None:
+        return cached["rates"], cached["meta"]
+
     url = RATES_URL.format(league=quote(league))
-    headers = {"User-Agent": "poe2-investments (local fund tracker)"}
     try:
-        resp = requests.get(url, headers=headers, timeout=10)
+        resp = scout_session().get(url, timeout=10)
         resp.raise_for_status()
-        pairs = resp.json()
+        pairs = _loads(resp.content)
     except Exception as e:
         print(f"Warning: Could not fetch exchange rates: {e}")
         return None
@@ -95,8 +235,6 @@ def fetch_exchange_rates(league):
         c1 = pair["CurrencyOne"]
         c2 = pair["CurrencyTwo"]
         c1_id, c2_id = c1["apiId"], c2["apiId"]
-        c1_price = float(pair["CurrencyOneData"]["RelativePrice"])
-        c2_price = float(pair["CurrencyTwoData"]["RelativePrice"])
 
         # Collect metadata (icon, display name) for all currencies
         for c in (c1, c2):
@@ -106,11 +244,15 @@ def fetch_exchange_rates(league):
                     "name": c.get("text", c["apiId"]),
                 }
 
+        # Only pairs quoted against divine produce a rate; skip float parsing otherwise
         if c1_id == "divine" and c2_id not in rates:
-            rates[c2_id] = c2_price / c1_price if c1_price else 0
+            c1_price = float(pair["CurrencyOneData"]["RelativePrice"])
+            rates[c2_id] = float(pair["CurrencyTwoData"]["RelativePrice"]) / c1_price if c1_price else 0
         elif c2_id == "divine" and c1_id not in rates:
-            rates[c1_id] = c1_price / c2_price if c2_price else 0
+            c2_price = float(pair["CurrencyTwoData"]["RelativePrice"])
+            rates[c1_id] = float(pair["CurrencyOneData"]["RelativePrice"]) / c2_price if c2_price else 0
 
+    _cache_put(cache_key, {"rates": rates, "meta": currency_meta})
     return rates, currency_meta
 
 
@@ -127,86 +269,168 @@ def to_divine(amount, currency, rates):
 # --- Trade History ---
 
 def fetch_trades(session, league):
+    cache_key = f"history:{league}"
+    cached = _cache_get(cache_key, TRADES_CACHE_TTL)
+    if cached is not None:
+        return cached["result"]
+
+    # Past the TTL, revalidate with the stored ETag so an unchanged history comes back as a bodyless 304
     url = HISTORY_URL.format(league=quote(league))
-    resp = api_request(session, "GET", url)
-    return resp.json().get("result", [])
+    stale = _cache_get(cache_key, None)
+    headers = {"If-None-Match": stale["etag"]} if stale and stale.get("etag") else {}
+    resp = api_request(session, "GET", url, headers=headers)
+    etag = resp.headers.get("ETag", "")
+    if resp.status_code == 304:
+        result, etag = stale["result"], etag or stale["etag"]
+    else:
+        result = _loads(resp.content).get("result", [])
+    _cache_put(cache_key, {"etag": etag, "result": result})
+    return result
 
 
 def _get_extended(item):
-    ext = item.get("extended", {})
+    """Return (mods, hashes) from an item's extended block."""
+    ext = item.get("extended")
     if not isinstance(ext, dict):
         return {}, {}
     return ext.get("mods", {}), ext.get("hashes", {})
 
 
+def _div_equivalent(amount, currency, rates):
+    """Divine value of a price, or "" when it can't be converted."""
+    if currency == "divine":
+        return amount
+    rate = rates.get(currency) if rates else None
+    return round(amount * rate, 2) if rate else ""
+
+
 def parse_trade(trade, rates=None):
-    item = trade.get("item", {})
+    if "sale_price" in trade:  # already parsed (e.g. loaded from trades.jsonl)
+        return trade
+    item = trade.get("item") or {}
+    get = item.get  # bound once for the ~20 field reads below
     price = trade.get("price", {})
-    name = item.get("name") or item.get("typeLine") or "Unknown"
-    base_type = item.get("baseType", "")
+    name = get("name") or get("typeLine") or "Unknown"
+    base_type = get("baseType", "")
     currency = price.get("currency", "")
     amount = price.get("amount", 0)
-
-    if rates:
-        div_equivalent = to_divine(amount, currency, rates)
-        if div_equivalent is None:
-            div_equivalent = ""
-    else:
-        div_equivalent = amount if currency == "divine" else ""
+    ext_mods, ext_hashes = _get_extended(item)
+    div_equivalent = _div_equivalent(amount, currency, rates)
 
     return {
         "timestamp": trade.get("time", ""),
         "item_name": name,
         "base_type": base_type,
-        "rarity": item.get("rarity", ""),
+        "rarity": get("rarity", ""),
         "sale_price": amount,
         "currency": currency,
         "div_equivalent": div_equivalent,
         "item_id": trade.get("item_id", ""),
-        "icon": item.get("icon", ""),
-        "ilvl": item.get("ilvl", 0),
-        "corrupted": item.get("corrupted", False),
-        "double_corrupted": item.get("doubleCorrupted", False),
-        "sanctified": item.get("sanctified", False),
-        "implicit_mods": item.get("implicitMods", []),
-        "explicit_mods": item.get("explicitMods", []),
-        "enchant_mods": item.get("enchantMods", []),
-        "desecrated_mods": item.get("desecratedMods", []),
-        "fractured_mods": item.get("fracturedMods", []),
-        "flavour_text": item.get("flavourText", []),
-        "frame_type": item.get("frameType", 0),
-        "type_line": item.get("typeLine", ""),
-        "properties": item.get("properties", []),
-        "sockets": item.get("sockets", []),
-        "socketed_items": item.get("socketedItems", []),
-        "rune_mods": item.get("runeMods", []),
-        "granted_skills": item.get("grantedSkills", []),
-        "extended_mods": _get_extended(item)[0],
-        "extended_hashes": _get_extended(item)[1],
+        "icon": get("icon", ""),
+        "ilvl": get("ilvl", 0),
+        "corrupted": get("corrupted", False),
+        "double_corrupted": get("doubleCorrupted", False),
+        "sanctified": get("sanctified", False),
+        "implicit_mods": get("implicitMods", []),
+        "explicit_mods": get("explicitMods", []),
+        "enchant_mods": get("enchantMods", []),
+        "desecrated_mods": get("desecratedMods", []),
+        "fractured_mods": get("fracturedMods", []),
+        "flavour_text": get("flavourText", []),
+        "frame_type": get("frameType", 0),
+        "type_line": get("typeLine", ""),
+        "properties": get("properties", []),
+        "sockets": get("sockets", []),
+        "socketed_items": get("socketedItems", []),
+        "rune_mods": get("runeMods", []),
+        "granted_skills": get("grantedSkills", []),
+        "extended_mods": ext_mods,
+        "extended_hashes": ext_hashes,
     }
 
 
-def load_seen_trades():
+def load_seen_trades(limit=None):
+    """Load stored trades, most recent first (only the newest `limit` if given)."""
+    if not TRADES_FILE.exists() and LEGACY_TRADES_FILE.exists():
+        save_trades(_loads(LEGACY_TRADES_FILE.read_bytes()))
     if TRADES_FILE.exists():
-        with open(TRADES_FILE) as f:
-            return json.load(f)
+        lines = TRADES_FILE.read_bytes().splitlines() if limit is None else _tail_lines(TRADES_FILE, limit)
+        return [_loads(line) for line in reversed(lines) if line]
     return []
 
 
-def save_trades(trades):
+def _tail_lines(path, count, block_size=1 << 16):
+    """Last `count` lines of a file, read backwards from the end in blocks."""
+    if count <= 0:
+        return []
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        data = b""
+        # One extra newline guarantees the first kept line is complete
+        while pos > 0 and data.count(b"\n") <= count:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    return data.splitlines()[-count:]
+
+
+def save_trades(new_trades):
+    """Append new trades (most recent first) to the append-only trade log."""
     DATA_DIR.mkdir(exist_ok=True)
-    with open(TRADES_FILE, "w") as f:
-        json.dump(trades, f, indent=2)
+    with open(TRADES_FILE, "ab") as f:
+        f.write(b"".join(_dumps(t, indent=False) + b"\n" for t in reversed(new_trades)))
+    _append_seen_ids(reversed(new_trades))
+
 
+def compact_trades():
+    """Rewrite the trade log de-duplicated by item_id and sorted oldest first."""
+    unique = {}
+    for trade in load_seen_trades():  # most recent first; keep the latest copy
+        unique.setdefault(trade["item_id"], trade)
+    ordered = sorted(unique.values(), key=lambda t: t.get("timestamp", ""))
+    DATA_DIR.mkdir(exist_ok=True)
+    _write_atomic(TRADES_FILE, b"".join(_dumps(t, indent=False) + b"\n" for t in ordered))
+    SEEN_IDS_FILE.write_text("".join(f"{item_id}\n" for item_id in unique))
+    return len(ordered)
 
-def find_new_trades(fetched, seen):
-    seen_ids = {t["item_id"] for t in seen}
-    new = []
-    for trade in fetched:
-        item_id = trade.get("item_id", "")
-        if item_id and item_id not in seen_ids:
-            new.append(trade)
-    return new
+
+def _append_seen_ids(trades):
+    with open(SEEN_IDS_FILE, "a") as f:
+        f.writelines(f"{t['item_id']}\n" for t in trades if t.get("item_id"))
+
+
+def load_seen_ids(persist=True):
+    """Load stored trade item_ids, rebuilding the sidecar from history if missing (in memory only unless persist)."""
+    if not persist and not SEEN_IDS_FILE.exists():
+        # Read history as-is: no legacy migration, no sidecar written
+        if TRADES_FILE.exists() or not LEGACY_TRADES_FILE.exists():
+            trades = load_seen_trades()
+        else:
+            trades = _loads(LEGACY_TRADES_FILE.read_bytes())
+        return {t["item_id"] for t in trades if t.get("item_id")}
+    if not SEEN_IDS_FILE.exists():
+        trades = load_seen_trades()  # migrating a legacy trades.json writes the sidecar
+        if not SEEN_IDS_FILE.exists():
+            DATA_DIR.mkdir(exist_ok=True)
+            _append_seen_ids(trades)
+    return set(SEEN_IDS_FILE.read_text().splitlines())
+
+
+def find_new_trades(fetched, seen_ids, full_scan=False):
+    """Unseen trades in fetch order; repeats within the response collapse to one entry."""
+    new = {}
+    for t in fetched:
+        item_id = t.get("item_id")
+        if not item_id:
+            continue
+        if item_id in seen_ids:
+            # History is newest first, so everything past the first seen trade is stored
+            if not full_scan:
+                break
+            continue
+        new.setdefault(item_id, t)
+    return list(new.values())
 
 
 # --- Current Listings ---
@@ -227,8 +451,7 @@ def fetch_listings(session, league, account):
         "sort": {"price": "asc"},
     }
 
-    resp = api_request(session, "POST", url, json=payload)
-    search_data = resp.json()
+    search_data = api_json(session, "POST", url, json=payload)
 
     query_id = search_data.get("id", "")
     item_ids = search_data.get("result", [])
@@ -236,66 +459,66 @@ def fetch_listings(session, league, account):
     if not item_ids:
         return []
 
-    # Fetch endpoint accepts max 10 IDs at a time
+    # Batches start FETCH_INTERVAL apart; each worker decodes its own
+    # response, so JSON parsing overlaps with the next request in flight
+    batches = [item_ids[i:i + FETCH_BATCH_SIZE] for i in range(0, len(item_ids), FETCH_BATCH_SIZE)]
+
+    def fetch_batch(batch):
+        fetch_url = FETCH_URL.format(ids=",".join(batch), query_id=query_id)
+        return api_json(session, "GET", fetch_url, interval=FETCH_INTERVAL).get("result", [])
+
     listings = []
-    for i in range(0, len(item_ids), 10):
-        batch = item_ids[i:i + 10]
-        ids_str = ",".join(batch)
-        fetch_url = FETCH_URL.format(ids=ids_str, query_id=query_id)
-        resp = api_request(session, "GET", fetch_url)
-        listings.extend(resp.json().get("result", []))
-        if i + 10 < len(item_ids):
-            time.sleep(2)
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        for result in pool.map(fetch_batch, batches):
+            listings.extend(result)
 
     return listings
 
 
 def parse_listing(entry, rates=None):
-    item = entry.get("item", {})
+    if "listed_price" in entry:  # already parsed (e.g. from a previous dashboard)
+        return entry
+    item = entry.get("item") or {}
+    get = item.get
     listing = entry.get("listing", {})
     price = listing.get("price", {})
-    name = item.get("name") or item.get("typeLine") or "Unknown"
-    base_type = item.get("baseType", "")
+    name = get("name") or get("typeLine") or "Unknown"
+    base_type = get("baseType", "")
     currency = price.get("currency", "")
     amount = price.get("amount", 0)
-
-    if rates:
-        div_equivalent = to_divine(amount, currency, rates)
-        if div_equivalent is None:
-            div_equivalent = ""
-    else:
-        div_equivalent = amount if currency == "divine" else ""
+    ext_mods, ext_hashes = _get_extended(item)
+    div_equivalent = _div_equivalent(amount, currency, rates)
 
     return {
         "item_id": entry.get("id", ""),
         "item_name": name,
         "base_type": base_type,
-        "rarity": item.get("rarity", ""),
+        "rarity": get("rarity", ""),
         "listed_price": amount,
         "currency": currency,
         "div_equivalent": div_equivalent,
         "indexed": listing.get("indexed", ""),
         "stash": listing.get("stash", {}).get("name", ""),
-        "icon": item.get("icon", ""),
-        "ilvl": item.get("ilvl", 0),
-        "corrupted": item.get("corrupted", False),
-        "double_corrupted": item.get("doubleCorrupted", False),
-        "sanctified": item.get("sanctified", False),
-        "implicit_mods": item.get("implicitMods", []),
-        "explicit_mods": item.get("explicitMods", []),
-        "enchant_mods": item.get("enchantMods", []),
-        "desecrated_mods": item.get("desecratedMods", []),
-        "fractured_mods": item.get("fracturedMods", []),
-        "flavour_text": item.get("flavourText", []),
-        "frame_type": item.get("frameType", 0),
-        "type_line": item.get("typeLine", ""),
-        "properties": item.get("properties", []),
-        "sockets": item.get("sockets", []),
-        "socketed_items": item.get("socketedItems", []),
-        "rune_mods": item.get("runeMods", []),
-        "granted_skills": item.get("grantedSkills", []),
-        "extended_mods": _get_extended(item)[0],
-        "extended_hashes": _get_extended(item)[1],
+        "icon": get("icon", ""),
+        "ilvl": get("ilvl", 0),
+        "corrupted": get("corrupted", False),
+        "double_corrupted": get("doubleCorrupted", False),
+        "sanctified": get("sanctified", False),
+        "implicit_mods": get("implicitMods", []),
+        "explicit_mods": get("explicitMods", []),
+        "enchant_mods": get("enchantMods", []),
+        "desecrated_mods": get("desecratedMods", []),
+        "fractured_mods": get("fracturedMods", []),
+        "flavour_text": get("flavourText", []),
+        "frame_type": get("frameType", 0),
+        "type_line": get("typeLine", ""),
+        "properties": get("properties", []),
+        "sockets": get("sockets", []),
+        "socketed_items": get("socketedItems", []),
+        "rune_mods": get("runeMods", []),
+        "granted_skills": get("grantedSkills", []),
+        "extended_mods": ext_mods,
+        "extended_hashes": ext_hashes,
     }
 
 
@@ -303,29 +526,51 @@ def parse_listing(entry, rates=None):
 
 def load_dashboard():
     if DASHBOARD_FILE.exists():
-        with open(DASHBOARD_FILE) as f:
-            return json.load(f)
+        return _loads(DASHBOARD_FILE.read_bytes())
     return {}
 
 
 def save_dashboard(data):
     DATA_DIR.mkdir(exist_ok=True)
-    with open(DASHBOARD_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    _write_atomic(DASHBOARD_FILE, _dumps(data, indent=False))
+
 
+def sum_div_equivalent(parsed):
+    """Total divine value of parsed trades/listings, skipping unconverted prices."""
+    return sum(v for p in parsed if isinstance(v := p["div_equivalent"], (int, float)))
 
-def build_dashboard(trades, listings, currencies, rates, inv_data=None):
-    parsed_listings = [parse_listing(l, rates) for l in listings]
-    listed_value = sum(
-        l["div_equivalent"] for l in parsed_listings
-        if isinstance(l["div_equivalent"], (int, float))
+
+def _listings_sig(listings, rates):
+    """Fingerprint of listing ids/prices plus the rates used to value them."""
+    prices = sorted(
+        (l.get("id", ""), price.get("amount") or 0, price.get("currency", ""))
+        for l in listings
+        for price in (l.get("listing", {}).get("price", {}),)
     )
+    return hashlib.sha256(_dumps([prices, sorted(rates.items())], indent=False)).hexdigest()
+
+
+def parse_listings(listings, rates, prev_dashboard):
+    """Parse listings, reusing the previous dashboard's when ids, prices and rates are unchanged."""
+    sig = _listings_sig(listings, rates)
+    prev_listings = prev_dashboard.get("listings")
+    # Only reuse when the stored listings are the ones the signature describes
+    if (sig == prev_dashboard.get("_listings_sig") and prev_listings is not None
+            and sorted(p.get("item_id", "") for p in prev_listings) == sorted(l.get("id", "") for l in listings)):
+        return prev_listings, sig
+    return [parse_listing(l, rates) for l in listings], sig
+
+
+def build_dashboard(trades, listings, currencies, rates, inv_data=None, parsed_listings=None, now=None):
+    if parsed_listings is None:
+        parsed_listings = [parse_listing(l, rates) for l in listings]
+    listed_value = sum_div_equivalent(parsed_listings)
 
     raw_divines = currencies_to_divine(currencies, rates)
-    adjusted_nav = calc_nav(currencies, rates, listed_value)
+    adjusted_nav = calc_nav(currencies, rates, listed_value, raw_divines)
 
     dashboard = {
-        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "updated_at": (now or datetime.now(timezone.utc)).isoformat(),
         "currencies": currencies,
         "raw_divines": raw_divines,
         "listed_value": listed_value,
@@ -334,13 +579,12 @@ def build_dashboard(trades, listings, currencies, rates, inv_data=None):
         "haircut": HAIRCUT,
         "exchange_rates": rates,
         "listings": parsed_listings,
-        "recent_sales": trades[:50],  # Last 50 sales for the dashboard
+        "recent_sales": trades[:RECENT_SALES_LIMIT],
     }
 
-    # Include investor data if available
+    # Include investor data if available (caller saves the recalculated inv_data)
     if inv_data and inv_data.get("investors"):
         inv_data = recalc_investors(inv_data, adjusted_nav)
-        save_investors(inv_data)
         pub = investors_to_dashboard(inv_data)
         dashboard["fund"] = pub["fund"]
         dashboard["investors"] = pub["investors"]
@@ -351,19 +595,29 @@ def build_dashboard(trades, listings, currencies, rates, inv_data=None):
 # --- CSV Export ---
 
 def export_csv(trades, path):
-    rows = [parse_trade(t) for t in trades]
-    if not rows:
+    """Append parsed trades' SALE_FIELDS columns to a CSV file, writing the header once."""
+    import csv
+
+    if not trades:
         return
-    fieldnames = ["timestamp", "item_name", "base_type", "rarity", "sale_price", "currency", "div_equivalent"]
-    with open(path, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(rows)
+    with open(path, "a", newline="", buffering=1 << 16) as f:
+        writer = csv.writer(f)
+        if f.tell() == 0:
+            writer.writerow(SALE_FIELDS)
+        writer.writerows(map(sale_row, trades))
 
 
 # --- Google Sheets ---
 
+def _sheet_cell(value):
+    """Raw (not formula-parsed) cell value, matching gspread's default RAW input."""
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
 def push_to_sheets(trades, config):
+    """Insert parsed trades below the Sales tab header; returns the number of rows pushed."""
     import gspread
 
     creds_path = Path(config["google_credentials"])
@@ -380,22 +634,22 @@ def push_to_sheets(trades, config):
     sheet = gc.open_by_key(config["sheet_id"])
     worksheet = sheet.worksheet(config["sales_tab"])
 
-    rows = []
-    for trade in trades:
-        parsed = parse_trade(trade)
-        rows.append([
-            parsed["timestamp"],
-            parsed["item_name"],
-            parsed["base_type"],
-            parsed["rarity"],
-            parsed["sale_price"],
-            parsed["currency"],
-            parsed["div_equivalent"],
-        ])
+    rows = [{"values": [_sheet_cell(v) for v in sale_row(t)]} for t in trades]
 
     if rows:
-        worksheet.insert_rows(rows, row=2)
-        print(f"Pushed {len(rows)} rows to Google Sheets")
+        # Open space below the header and fill it in a single batchUpdate round trip
+        sheet.batch_update({"requests": [
+            {"insertDimension": {
+                "range": {"sheetId": worksheet.id, "dimension": "ROWS", "startIndex": 1, "endIndex": 1 + len(rows)},
+                "inheritFromBefore": False,
+            }},
+            {"updateCells": {
+                "start": {"sheetId": worksheet.id, "rowIndex": 1, "columnIndex": 0},
+                "rows": rows,
+                "fields": "userEnteredValue",
+            }},
+        ]})
+    return len(rows)
 
 
 # --- Investor Management ---
@@ -405,15 +659,15 @@ def load_investors():
     if not INVESTORS_FILE.exists():
         decrypt_investors()
     if INVESTORS_FILE.exists():
-        with open(INVESTORS_FILE) as f:
-            return json.load(f)
-    return {"fund": _default_fund_config(), "investors": []}
+        with open(INVESTORS_FILE, "rb") as f:
+            return index_investors(_loads(f.read()))
+    return index_investors({"fund": _default_fund_config(), "investors": []})
 
 
 def save_investors(data):
     DATA_DIR.mkdir(exist_ok=True)
-    with open(INVESTORS_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    # Underscore keys are in-memory only (e.g. the name index)
+    _write_atomic(INVESTORS_FILE, _dumps({k: v for k, v in data.items() if not k.startswith("_")}))
 
 
 def _default_fund_config():
@@ -440,16 +694,23 @@ def migrate_fund_data(inv_data, prev_dashboard):
 
 def currencies_to_divine(currencies, rates):
     """Sum all currency values in divine terms."""
-    return sum(amt * rates.get(cur, 0) for cur, amt in currencies.items() if rates.get(cur) is not None)
+    total = 0
+    for cur, amt in currencies.items():
+        rate = rates.get(cur)
+        if rate is not None:
+            total += amt * rate
+    return total
 
 
 def hash_code(code):
+    """SHA-256 hex of an invite code; must match sha256() in index.html."""
     return hashlib.sha256(code.encode()).hexdigest()
 
 
-def calc_nav(currencies, rates, listed_value):
+def calc_nav(currencies, rates, listed_value, liquid=None):
     """NAV = liquid (all currencies in divine terms) + listed * haircut."""
-    liquid = currencies_to_divine(currencies, rates)
+    if liquid is None:
+        liquid = currencies_to_divine(currencies, rates)
     return liquid + listed_value * HAIRCUT
 
 
@@ -484,20 +745,20 @@ def recalc_investors(inv_data, nav):
     total_deposited = 0
 
     for investor in inv_data["investors"]:
-        value = round(investor["units"] * unit_price, 2)
-        profit = round(value - investor["deposited"], 2)
-        share = investor["units"] / total_units if total_units > 0 else 0
-
-        pct_change = ((value - investor["deposited"]) / investor["deposited"] * 100) if investor["deposited"] > 0 else None
+        units = investor["units"]
+        deposited = investor["deposited"]
+        value = round(units * unit_price, 2)
+        gain = value - deposited
+        profit = round(gain, 2)
 
         investor["value"] = value
         investor["profit"] = profit
-        investor["share"] = round(share, 6)
-        investor["pct_change"] = round(pct_change, 1) if pct_change is not None else None
+        investor["share"] = round(units / total_units, 6) if total_units > 0 else 0
+        investor["pct_change"] = round(gain / deposited * 100, 1) if deposited > 0 else None
 
         total_value += value
         total_profit += profit
-        total_deposited += investor["deposited"]
+        total_deposited += deposited
 
     fund["total_deposited"] = round(total_deposited, 2)
     fund["total_profit"] = round(total_profit, 2)
@@ -505,7 +766,16 @@ def recalc_investors(inv_data, nav):
     return inv_data
 
 
+def index_investors(inv_data):
+    """Attach a lowercase-name lookup used by find_investor (not persisted)."""
+    inv_data["_index"] = {inv["name"].lower(): inv for inv in inv_data["investors"]}
+    return inv_data
+
+
 def find_investor(inv_data, name):
+    index = inv_data.get("_index")
+    if index is not None:
+        return index.get(name.lower())
     for inv in inv_data["investors"]:
         if inv["name"].lower() == name.lower():
             return inv
@@ -537,13 +807,15 @@ def create_investor(inv_data, name):
         "history": [],
     }
     inv_data["investors"].append(investor)
+    if "_index" in inv_data:
+        inv_data["_index"][name.lower()] = investor
     print(f"Created investor: {name}")
     print(f"Invite code: {code}")
     print(f"Share this code with them — it's their key to the personalized view.")
     return inv_data
 
 
-def create_pending(inv_data, name, amount, currency, nav, rates, req_type):
+def create_pending(inv_data, name, amount, currency, nav, rates, req_type, now=None):
     """Create a pending deposit or withdrawal request locked at current unit price."""
     fund = inv_data["fund"]
     total_units = fund["total_units"]
@@ -575,7 +847,7 @@ def create_pending(inv_data, name, amount, currency, nav, rates, req_type):
         "amount": round(div_equivalent, 2),
         "original_amount": amount,
         "currency": currency,
-        "date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+        "date": (now or datetime.now(timezone.utc)).strftime("%Y-%m-%d"),
         "locked_price": round(unit_price, 6),
     }
 
@@ -587,9 +859,10 @@ def create_pending(inv_data, name, amount, currency, nav, rates, req_type):
     return inv_data
 
 
-def process_fulfill(inv_data, name):
+def process_fulfill(inv_data, name, now=None):
     """Fulfill a pending request (deposit or withdrawal)."""
     fund = inv_data["fund"]
+    date = (now or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
 
     investor = find_investor(inv_data, name)
     if not investor:
@@ -622,7 +895,7 @@ def process_fulfill(inv_data, name):
         history_entry = {
             "type": "deposit",
             "amount": amount,
-            "date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+            "date": date,
             "unit_price": locked_price,
         }
         if currency != "divine":
@@ -647,7 +920,7 @@ def process_fulfill(inv_data, name):
         history_entry = {
             "type": "withdraw",
             "amount": amount,
-            "date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+            "date": date,
             "unit_price": locked_price,
         }
         if currency != "divine":
@@ -703,24 +976,52 @@ def investors_to_dashboard(inv_data):
 
 # --- CLI ---
 
-def print_summary(new_trades, listings_summary):
-    parsed = [parse_trade(t) for t in new_trades]
-    total_div = sum(p["div_equivalent"] for p in parsed if isinstance(p["div_equivalent"], (int, float)))
-    non_div = [p for p in parsed if p["div_equivalent"] == ""]
+def print_summary(new_parsed, listings_summary):
+    # One pass totals revenue and formats the trade lines; output is written once
+    total_div = 0
+    non_div = 0
+    trade_lines = []
+    for p in new_parsed:
+        div = p["div_equivalent"]
+        if div == "":
+            non_div += 1
+        else:
+            total_div += div
+        trade_lines.append(f"  {p['item_name']} ({p['base_type']}) — {p['sale_price']} {p['currency']}")
 
-    print(f"\n{len(new_trades)} new trade(s)")
+    lines = [f"\n{len(new_parsed)} new trade(s)"]
     if total_div:
-        print(f"Revenue: {total_div:,.0f} divine")
+        lines.append(f"Revenue: {total_div:,.0f} divine")
     if non_div:
-        print(f"  ({len(non_div)} trade(s) in non-divine currency — convert manually)")
+        lines.append(f"  ({non_div} trade(s) with no exchange rate — convert manually)")
+    lines.append("\nNew trades:")
+    lines += trade_lines
+    if listings_summary:
+        lines.append(f"\nCurrent listings: {listings_summary['count']} items, ~{listings_summary['value']:,.0f} divine listed value")
+    print("\n".join(lines))
 
-    print("\nNew trades:")
-    for p in parsed:
-        price_str = f"{p['sale_price']} {p['currency']}"
-        print(f"  {p['item_name']} ({p['base_type']}) — {price_str}")
 
-    if listings_summary:
-        print(f"\nCurrent listings: {listings_summary['count']} items, ~{listings_summary['value']:,.0f} divine listed value")
+def _openssl_cipher(key, salt):
+    """AES-256-CBC cipher keyed the same way as `openssl enc -aes-256-cbc -pbkdf2`."""
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=48, salt=salt, iterations=OPENSSL_PBKDF2_ITERATIONS)
+    key_iv = kdf.derive(key.encode())
+    return Cipher(algorithms.AES(key_iv[:32]), modes.CBC(key_iv[32:]))
+
+
+def _aes_encrypt(data, key):
+    salt = secrets.token_bytes(8)
+    padder = padding.PKCS7(128).padder()
+    encryptor = _openssl_cipher(key, salt).encryptor()
+    body = encryptor.update(padder.update(data) + padder.finalize()) + encryptor.finalize()
+    return OPENSSL_MAGIC + salt + body
+
+
+def _aes_decrypt(blob, key):
+    if blob[:8] != OPENSSL_MAGIC:
+        raise ValueError("missing Salted__ header")
+    decryptor = _openssl_cipher(key, blob[8:16]).decryptor()
+    unpadder = padding.PKCS7(128).unpadder()
+    return unpadder.update(decryptor.update(blob[16:]) + decryptor.finalize()) + unpadder.finalize()
 
 
 def encrypt_investors():
@@ -729,11 +1030,21 @@ def encrypt_investors():
     if not key:
         print("Warning: INVESTORS_KEY not set, skipping encryption.")
         return False
+    enc_file = Path(str(INVESTORS_FILE) + ".enc")
+    if Cipher is not None:
+        try:
+            enc_file.write_bytes(_aes_encrypt(INVESTORS_FILE.read_bytes(), key))
+            return True
+        except OSError as e:
+            print(f"Encryption failed: {e}")
+            return False
+    import subprocess
+
     try:
         subprocess.run(
             ["openssl", "enc", "-aes-256-cbc", "-pbkdf2", "-salt",
              "-in", str(INVESTORS_FILE),
-             "-out", str(INVESTORS_FILE) + ".enc",
+             "-out", str(enc_file),
              "-pass", f"pass:{key}"],
             check=True, capture_output=True,
         )
@@ -751,6 +1062,16 @@ def decrypt_investors():
     key = os.getenv("INVESTORS_KEY")
     if not key:
         return False
+    if Cipher is not None:
+        try:
+            INVESTORS_FILE.write_bytes(_aes_decrypt(enc_file.read_bytes(), key))
+        except (OSError, ValueError) as e:
+            print(f"Decryption failed: {e}")
+            return False
+        print("Decrypted investors.json from encrypted store.")
+        return True
+    import subprocess
+
     try:
         subprocess.run(
             ["openssl", "enc", "-aes-256-cbc", "-pbkdf2", "-d",
@@ -768,24 +1089,22 @@ def decrypt_investors():
 
 def git_push():
     """Encrypt investors.json, commit and push dashboard + encrypted investors."""
+    import subprocess
+
     repo_root = Path(__file__).parent
     try:
         # Encrypt investors.json before committing
         encrypt_investors()
 
-        subprocess.run(
-            ["git", "add", "-f", "data/dashboard.json", "data/investors.json.enc"],
-            cwd=repo_root, check=True, capture_output=True,
-        )
-        result = subprocess.run(
-            ["git", "status", "--porcelain", "data/dashboard.json", "data/investors.json.enc"],
-            cwd=repo_root, check=True, capture_output=True, text=True,
-        )
-        if not result.stdout.strip():
+        paths = ["data/dashboard.json", "data/investors.json.enc"]
+        # Exit code 0 means the working tree matches HEAD for these paths
+        result = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", *paths], cwd=repo_root, capture_output=True)
+        if result.returncode == 0:
             print("No data changes to push.")
             return
+        # Committing with pathspecs stages just these files, no separate `git add`
         subprocess.run(
-            ["git", "commit", "-m", "Update fund data"],
+            ["git", "commit", "-m", "Update fund data", "--", *paths],
             cwd=repo_root, check=True, capture_output=True,
         )
         subprocess.run(
@@ -797,9 +1116,40 @@ def git_push():
         print(f"Git push failed: {e.stderr.decode().strip() if e.stderr else e}")
 
 
+def fetch_all(session, config, use_cache=True):
+    """Fetch exchange rates, trade history and listings concurrently."""
+    import requests
+
+    league = config["league"]
+    print(f"Fetching exchange rates, trade history and listings for {league}...")
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        rates_future = pool.submit(fetch_exchange_rates, league, use_cache)
+        trades_future = pool.submit(fetch_trades, session, league)
+        listings_future = pool.submit(fetch_listings, session, league, config["account"])
+
+        rates_result = rates_future.result()
+
+        # Trade history is the most likely to 429 — don't let it block listings
+        fetched = []
+        try:
+            fetched = trades_future.result()
+            print(f"Fetched {len(fetched)} trades from API")
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 429:
+                print(f"  Trade history rate limited — skipping, will retry next run")
+            else:
+                raise
+
+        listings = listings_future.result()
+        print(f"Found {len(listings)} active listings")
+
+    return rates_result, fetched, listings
+
+
 def process_batch(payload_str, config, prev_dashboard, inv_data):
     """Process a batch payload from the manager console / GitHub Actions."""
-    payload = json.loads(payload_str)
+    payload = _loads(payload_str)
+    now = datetime.now(timezone.utc)
     inv_data = migrate_fund_data(inv_data, prev_dashboard)
     currencies = inv_data["fund"]["currencies"]
     rates = prev_dashboard.get("exchange_rates", {"divine": 1.0})
@@ -813,56 +1163,38 @@ def process_batch(payload_str, config, prev_dashboard, inv_data):
     # Use most recent sale timestamp to determine what's new (works without trades.json)
     prev_sales = prev_dashboard.get("recent_sales", [])
     latest_sale_time = prev_sales[0].get("timestamp", "") if prev_sales else ""
-    new_trades = []
+    new_parsed = []
     listings = []
 
     # Step 1: Fetch trades + listings if requested
     if should_fetch:
         session = make_session(config["poesessid"])
-
-        print("Fetching exchange rates...")
-        result = fetch_exchange_rates(config["league"])
+        result, fetched, listings = fetch_all(session, config)
         if result:
             fetched_rates, fetched_meta = result
             if fetched_rates:
                 rates = fetched_rates
                 currency_meta = fetched_meta
 
-        fetched = []
-        print(f"Fetching trade history for {config['league']}...")
-        try:
-            fetched = fetch_trades(session, config["league"])
-            print(f"Fetched {len(fetched)} trades from API")
-        except requests.exceptions.HTTPError as e:
-            if e.response is not None and e.response.status_code == 429:
-                print(f"  Trade history rate limited — skipping")
-            else:
-                raise
-
-        # Find trades newer than most recent known sale
-        if fetched and latest_sale_time:
-            new_trades = [t for t in fetched if t.get("time", "") > latest_sale_time]
-        elif fetched and not latest_sale_time:
-            new_trades = fetched  # First run, all are new
-
-        print("Fetching current listings...")
-        listings = fetch_listings(session, config["league"], config["account"])
-        print(f"Found {len(listings)} active listings")
+        # Single pass: keep trades newer than the most recent known sale (all of
+        # them on first run), parse them and total revenue per currency
+        revenue_by_currency = {}
+        for t in fetched:
+            if latest_sale_time and t.get("time", "") <= latest_sale_time:
+                continue
+            parsed = parse_trade(t, rates)
+            new_parsed.append(parsed)
+            cur = parsed["currency"]
+            amt = parsed["sale_price"]
+            if cur and amt > 0:
+                revenue_by_currency[cur] = revenue_by_currency.get(cur, 0) + amt
 
         # Add trade revenue per-currency
-        if new_trades:
-            new_parsed_tmp = [parse_trade(t, rates) for t in new_trades]
-            revenue_by_currency = {}
-            for t in new_parsed_tmp:
-                cur = t.get("currency", "divine")
-                amt = t.get("sale_price", 0)
-                if cur and amt > 0:
-                    revenue_by_currency[cur] = revenue_by_currency.get(cur, 0) + amt
-            if revenue_by_currency:
-                print(f"Adding trade revenue from {len(new_parsed_tmp)} new sale(s):")
-                for cur, amt in revenue_by_currency.items():
-                    currencies[cur] = currencies.get(cur, 0) + amt
-                    print(f"  +{amt:,.0f} {cur}")
+        if revenue_by_currency:
+            print(f"Adding trade revenue from {len(new_parsed)} new sale(s):")
+            for cur, amt in revenue_by_currency.items():
+                currencies[cur] = currencies.get(cur, 0) + amt
+                print(f"  +{amt:,.0f} {cur}")
 
     # Step 2: Apply currency overrides (only changed fields)
     for cur, amt in currency_overrides.items():
@@ -871,9 +1203,14 @@ def process_batch(payload_str, config, prev_dashboard, inv_data):
 
     # Step 3: Create pending for each operation
     listed_value = prev_dashboard.get("listed_value", 0)
+    parsed_listings = None
+    listings_sig = prev_dashboard.get("_listings_sig", "")
+    if should_fetch:
+        # The saved listings get replaced by this fetch, so the old signature no longer applies
+        listings_sig = ""
     if should_fetch and listings:
-        parsed_listings = [parse_listing(l, rates) for l in listings]
-        listed_value = sum(l["div_equivalent"] for l in parsed_listings if isinstance(l["div_equivalent"], (int, float)))
+        parsed_listings, listings_sig = parse_listings(listings, rates, prev_dashboard)
+        listed_value = sum_div_equivalent(parsed_listings)
 
     nav = calc_nav(currencies, rates, listed_value)
 
@@ -882,7 +1219,7 @@ def process_batch(payload_str, config, prev_dashboard, inv_data):
         investor_name = op["investor"]
         amount = op["amount"]
         currency = op.get("currency", "divine")
-        result = create_pending(inv_data, investor_name, amount, currency, nav, rates, action)
+        result = create_pending(inv_data, investor_name, amount, currency, nav, rates, action, now)
         if result:
             inv_data = result
 
@@ -891,7 +1228,7 @@ def process_batch(payload_str, config, prev_dashboard, inv_data):
         fulfilled_any = False
         for inv in list(inv_data["investors"]):
             if inv.get("pending"):
-                result = process_fulfill(inv_data, inv["name"])
+                result = process_fulfill(inv_data, inv["name"], now)
                 if result:
                     inv_data = result
                     fulfilled_any = True
@@ -901,22 +1238,20 @@ def process_batch(payload_str, config, prev_dashboard, inv_data):
             print("No pending requests to fulfill.")
 
     # Recalculate NAV after all mutations
-    nav = calc_nav(currencies, rates, listed_value)
+    raw_divines = currencies_to_divine(currencies, rates)
+    nav = calc_nav(currencies, rates, listed_value, raw_divines)
 
     # Step 5: Save everything
     inv_data["fund"]["currencies"] = currencies
-    save_investors(inv_data)
 
     if should_fetch:
-        new_parsed = [parse_trade(t, rates) for t in new_trades] if new_trades else []
         all_trades = new_parsed + prev_sales
-        dashboard = build_dashboard(all_trades, listings, currencies, rates, inv_data)
+        dashboard = build_dashboard(all_trades, listings, currencies, rates, inv_data, parsed_listings, now)
     else:
-        raw_divines = currencies_to_divine(currencies, rates)
         prev_listings = prev_dashboard.get("listings", [])
         prev_sales = prev_dashboard.get("recent_sales", [])
         dashboard = {
-            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "updated_at": now.isoformat(),
             "currencies": currencies,
             "raw_divines": raw_divines,
             "listed_value": listed_value,
@@ -929,12 +1264,13 @@ def process_batch(payload_str, config, prev_dashboard, inv_data):
         }
         if inv_data.get("investors"):
             inv_data = recalc_investors(inv_data, nav)
-            save_investors(inv_data)
             pub = investors_to_dashboard(inv_data)
             dashboard["fund"] = pub["fund"]
             dashboard["investors"] = pub["investors"]
 
+    save_investors(inv_data)
     dashboard["currency_meta"] = currency_meta
+    dashboard["_listings_sig"] = listings_sig
     save_dashboard(dashboard)
     print(f"Dashboard data saved to {DASHBOARD_FILE}")
     return dashboard
@@ -955,12 +1291,21 @@ def main():
     parser.add_argument("--gen-code", type=str, metavar="NAME", help="Generate new invite code for investor")
     parser.add_argument("--set-webhook", type=str, metavar="URL", help="Set Discord webhook URL for investor requests")
     parser.add_argument("--fetch", action="store_true", help="Fetch trades and listings from PoE2 API")
+    parser.add_argument("--compact", action="store_true", help="Compact the trade log (dedupe + sort) and exit")
+    parser.add_argument("--force-refresh-rates", action="store_true", help="Ignore cached exchange rates when fetching")
+    parser.add_argument("--full-scan", action="store_true", help="Check every fetched trade for new ones, not just those before the first seen trade")
     parser.add_argument("--batch", type=str, metavar="PAYLOAD", help="Process batch JSON payload (from manager console)")
 
     args = parser.parse_args()
+    now = datetime.now(timezone.utc)
 
     config = get_config()
 
+    if args.compact:
+        count = compact_trades()
+        print(f"Compacted trade log to {count} trades.")
+        return
+
     # Load previous dashboard for persisted values
     prev_dashboard = load_dashboard()
 
@@ -991,9 +1336,12 @@ def main():
     is_investor_op = any([args.add_investor, args.deposit, args.withdraw, args.fulfill, args.gen_code, args.set_webhook])
     should_fetch = args.fetch
 
+    # Investor changes are written once, just before main() returns or pushes
+    inv_dirty = False
+
     if args.set_webhook:
         inv_data["fund"]["discord_webhook"] = args.set_webhook
-        save_investors(inv_data)
+        inv_dirty = True
         print(f"Discord webhook set.")
         if not is_investor_op or args.set_webhook == args.set_webhook:  # only op
             pass  # continue to potentially do other ops
@@ -1005,53 +1353,59 @@ def main():
     if args.gen_code:
         result = generate_invite_code(inv_data, args.gen_code)
         if result:
-            save_investors(result)
+            inv_dirty = True
         if not args.deposit and not args.withdraw and not args.fulfill and not args.add_investor:
+            if inv_dirty:
+                save_investors(inv_data)
             return
 
     if args.add_investor:
         result = create_investor(inv_data, args.add_investor)
         if not result:
+            if inv_dirty:
+                save_investors(inv_data)
             return
         inv_data = result
-        save_investors(inv_data)
+        inv_dirty = True
 
     if args.add_investor and args.deposit:
         # --add-investor NAME --deposit AMOUNT
         amount = float(args.deposit[0])
-        result = create_pending(inv_data, args.add_investor, amount, "divine", nav, rates, "deposit")
+        result = create_pending(inv_data, args.add_investor, amount, "divine", nav, rates, "deposit", now)
         if result:
             inv_data = result
-            save_investors(inv_data)
+            inv_dirty = True
     elif args.deposit:
         # --deposit NAME AMOUNT
         if len(args.deposit) != 2:
             print("Usage: --deposit NAME AMOUNT")
+            if inv_dirty:
+                save_investors(inv_data)
             sys.exit(1)
         name, amount = args.deposit[0], float(args.deposit[1])
-        result = create_pending(inv_data, name, amount, "divine", nav, rates, "deposit")
+        result = create_pending(inv_data, name, amount, "divine", nav, rates, "deposit", now)
         if result:
             inv_data = result
-            save_investors(inv_data)
+            inv_dirty = True
 
     if args.withdraw:
         name, amount = args.withdraw[0], float(args.withdraw[1])
-        result = create_pending(inv_data, name, amount, "divine", nav, rates, "withdraw")
+        result = create_pending(inv_data, name, amount, "divine", nav, rates, "withdraw", now)
         if result:
             inv_data = result
-            save_investors(inv_data)
+            inv_dirty = True
 
     if args.fulfill:
         fulfilled_any = False
         for inv in list(inv_data["investors"]):
             if inv.get("pending"):
-                result = process_fulfill(inv_data, inv["name"])
+                result = process_fulfill(inv_data, inv["name"], now)
                 if result:
                     inv_data = result
                     fulfilled_any = True
         if fulfilled_any:
             inv_data = recalc_investors(inv_data, nav)
-            save_investors(inv_data)
+            inv_dirty = True
         else:
             print("No pending requests to fulfill.")
 
@@ -1062,7 +1416,7 @@ def main():
             prev_sales = prev_dashboard.get("recent_sales", [])
             raw_divines = currencies_to_divine(currencies, rates)
             dashboard = {
-                "updated_at": datetime.now(timezone.utc).isoformat(),
+                "updated_at": now.isoformat(),
                 "currencies": currencies,
                 "raw_divines": raw_divines,
                 "listed_value": listed_value,
@@ -1075,22 +1429,29 @@ def main():
             }
             if inv_data.get("investors"):
                 inv_data = recalc_investors(inv_data, nav)
-                save_investors(inv_data)
+                inv_dirty = True
                 pub = investors_to_dashboard(inv_data)
                 dashboard["fund"] = pub["fund"]
                 dashboard["investors"] = pub["investors"]
             dashboard["currency_meta"] = currency_meta
+            dashboard["_listings_sig"] = prev_dashboard.get("_listings_sig", "")
             save_dashboard(dashboard)
             print(f"Dashboard data saved to {DASHBOARD_FILE}")
-            if args.push:
-                git_push()
+        if inv_dirty:
+            save_investors(inv_data)
+        if args.push and not args.dry_run:
+            git_push()
         return
 
+    # Persist investor changes before fetching: a failed fetch must not lose them,
+    # and trade revenue added below must not reach investors.json on a dry run
+    if inv_dirty:
+        save_investors(inv_data)
+
     session = make_session(config["poesessid"])
+    result, fetched, listings = fetch_all(session, config, use_cache=not args.force_refresh_rates)
 
-    # Fetch exchange rates (overrides default rates)
-    print("Fetching exchange rates...")
-    result = fetch_exchange_rates(config["league"])
+    # Fresh exchange rates override the stored ones
     if result:
         fetched_rates, fetched_meta = result
         if fetched_rates:
@@ -1104,61 +1465,46 @@ def main():
                 if rate > 0:
                     print(f"    {1/rate:,.2f} {currency}" if rate < 1 else f"    {currency}: {rate:,.2f} divine each")
 
-    # Fetch trade history (most likely to 429 — don't let it block listings)
-    fetched = []
-    print(f"Fetching trade history for {config['league']}...")
-    try:
-        fetched = fetch_trades(session, config["league"])
-        print(f"Fetched {len(fetched)} trades from API")
-    except requests.exceptions.HTTPError as e:
-        if e.response is not None and e.response.status_code == 429:
-            print(f"  Trade history rate limited — skipping, will retry next run")
-        else:
-            raise
-
-    seen = load_seen_trades()
-    new_trades = find_new_trades(fetched, seen) if fetched else []
-
-    # Fetch current listings
-    print("Fetching current listings...")
-    listings = fetch_listings(session, config["league"], config["account"])
-    print(f"Found {len(listings)} active listings")
+    seen_ids = load_seen_ids(persist=not args.dry_run)
+    new_trades = find_new_trades(fetched, seen_ids, args.full_scan) if fetched else []
+    new_trades.sort(key=lambda t: t.get("time", ""), reverse=True)
+    new_parsed = [parse_trade(t, rates) for t in new_trades]
 
     listings_summary = None
+    parsed_listings = None
+    listings_sig = ""
     if listings:
-        parsed_listings = [parse_listing(l, rates) for l in listings]
-        listed_value = sum(l["div_equivalent"] for l in parsed_listings if isinstance(l["div_equivalent"], (int, float)))
+        parsed_listings, listings_sig = parse_listings(listings, rates, prev_dashboard)
+        listed_value = sum_div_equivalent(parsed_listings)
         listings_summary = {"count": len(listings), "value": listed_value}
 
     # Add net new sales to fund currencies (per-currency)
-    if new_trades:
-        new_parsed_tmp = [parse_trade(t, rates) for t in new_trades]
+    if new_parsed:
         revenue_by_currency = {}
-        for t in new_parsed_tmp:
+        for t in new_parsed:
             cur = t.get("currency", "divine")
             amt = t.get("sale_price", 0)
             if cur and amt > 0:
                 revenue_by_currency[cur] = revenue_by_currency.get(cur, 0) + amt
         if revenue_by_currency:
-            print(f"\nAdding trade revenue from {len(new_parsed_tmp)} new sale(s):")
+            print(f"\nAdding trade revenue from {len(new_parsed)} new sale(s):")
             for cur, amt in revenue_by_currency.items():
                 currencies[cur] = currencies.get(cur, 0) + amt
                 print(f"  +{amt:,.0f} {cur}")
 
     # Recalculate NAV with fresh data
     fresh_listed = listings_summary["value"] if listings_summary else 0
-    nav = calc_nav(currencies, rates, fresh_listed)
+    raw_divines = currencies_to_divine(currencies, rates)
+    nav = calc_nav(currencies, rates, fresh_listed, raw_divines)
 
     # Print summary
-    if new_trades:
-        new_trades.sort(key=lambda t: t.get("time", ""), reverse=True)
-        print_summary(new_trades, listings_summary)
+    if new_parsed:
+        print_summary(new_parsed, listings_summary)
     else:
         print("No new trades since last run.")
         if listings_summary:
             print(f"\nCurrent listings: {listings_summary['count']} items, ~{listings_summary['value']:,.0f} divine listed value")
 
-    raw_divines = currencies_to_divine(currencies, rates)
     print(f"\nCurrencies:")
     for cur, amt in currencies.items():
         if amt != 0:
@@ -1172,29 +1518,32 @@ def main():
         print("\n(dry run — nothing saved)")
         return
 
-    # Save trades
-    if new_trades:
-        new_parsed = [parse_trade(t, rates) for t in new_trades]
-        save_trades(new_parsed + seen)
+    # Sheets is the only network step left; push while the local files are written
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        sheets_push = pool.submit(push_to_sheets, new_parsed, config) if args.sheets and new_parsed else None
 
-        csv_path = DATA_DIR / "new_trades.csv"
-        export_csv(new_trades, csv_path)
-        print(f"\nExported to {csv_path}")
-
-    # Save currencies back to investors.json
-    inv_data["fund"]["currencies"] = currencies
-    save_investors(inv_data)
+        # Save trades
+        if new_parsed:
+            save_trades(new_parsed)
 
-    # Build and save dashboard
-    all_trades = (([parse_trade(t, rates) for t in new_trades] + seen) if new_trades else seen)
-    dashboard = build_dashboard(all_trades, listings, currencies, rates, inv_data)
-    dashboard["currency_meta"] = currency_meta
-    save_dashboard(dashboard)
-    print(f"Dashboard data saved to {DASHBOARD_FILE}")
+            csv_path = DATA_DIR / "new_trades.csv"
+            export_csv(new_parsed, csv_path)
+            print(f"\nExported to {csv_path}")
 
-    # Push to sheets if requested
-    if args.sheets and new_trades:
-        push_to_sheets(new_trades, config)
+        # Build and save dashboard (new trades were saved above), then write
+        # currencies and recalculated positions back to investors.json
+        inv_data["fund"]["currencies"] = currencies
+        all_trades = load_seen_trades(limit=RECENT_SALES_LIMIT)
+        dashboard = build_dashboard(all_trades, listings, currencies, rates, inv_data, parsed_listings, now)
+        save_investors(inv_data)
+        dashboard["currency_meta"] = currency_meta
+        dashboard["_listings_sig"] = listings_sig
+        save_dashboard(dashboard)
+        print(f"Dashboard data saved to {DASHBOARD_FILE}")
+
+        if sheets_push:
+            # Printed here so output from the worker thread can't interleave
+            print(f"Pushed {sheets_push.result()} rows to Google Sheets")
 
     # Git push if requested
     if args.push: